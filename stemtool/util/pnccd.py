@@ -1,4 +1,3 @@
-from __future__ import print_function, division, absolute_import
 import multiprocessing
 import dask.array as da
 import os
@@ -9,7 +8,10 @@ import numpy as np
 import h5py
 import stemtool as st
 import glob
+import threading
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 
 class Frms6Reader(object):
@@ -78,11 +80,56 @@ class Frms6Reader(object):
     )
     frameHeaderSizeInBytes = struct.calcsize(frameHeaderFormat)
     frameHeaderStruct = struct.Struct(frameHeaderFormat)
+    # The same frame header as a numpy structured dtype, so that the headers
+    # of all frames can be parsed in one go. Offsets mirror frameHeaderFormat
+    # (standard sizes, no alignment, native byte order).
+    frameHeaderDtype = np.dtype(
+        {
+            "names": [
+                "start",
+                "info",
+                "id",
+                "height",
+                "tv_sec",
+                "tv_usec",
+                "index",
+                "temp",
+                "the_start",
+                "the_height",
+                "external_id",
+                "bunch_id",
+            ],
+            "formats": [
+                "u1",
+                "u1",
+                "u1",
+                "u1",
+                "=u4",
+                "=u4",
+                "=u4",
+                "=f8",
+                "=u2",
+                "=u2",
+                "=u4",
+                "=u8",
+            ],
+            "offsets": [0, 1, 2, 3, 4, 8, 12, 16, 24, 26, 28, 32],
+            "itemsize": frameHeaderSizeInBytes,
+        }
+    )
+
+    # Number of frames per scattered read (two buffers per frame, well below
+    # the usual IOV_MAX of 1024)
+    framesPerRead = 32
+    # Number of bytes the kernel is asked to read ahead of memory-mapped
+    # frame access
+    prefetchSizeInBytes = 64 * 1024 ** 2
 
     def __init__(self):
         pass
 
     @staticmethod
+    @lru_cache(maxsize=8)
     def getFrameSizeInBytes(frameWidth, frameHeight):
         """Convenience method to determine the frame size (without frame
         header!)
@@ -97,6 +144,29 @@ class Frms6Reader(object):
         """
         return struct.calcsize(str(frameWidth * frameHeight) + "h")
 
+    @classmethod
+    @lru_cache(maxsize=8)
+    def getRecordDtype(cls, frameWidth, frameHeight):
+        """Structured dtype of a single frame as it is stored on disk, i.e.
+        the frame header followed by the frame contents
+
+        Args:
+            frameWidth (int): width of the frame
+            frameHeight (int): height of the frame
+
+        Returns:
+            numpy.dtype: Record with the fields "header" and "frame". The
+                frame is given as unsigned 16 bit integers of shape
+                (frameHeight, frameWidth)
+
+        """
+        return np.dtype(
+            [
+                ("header", cls.frameHeaderDtype),
+                ("frame", "=u2", (frameHeight, frameWidth)),
+            ]
+        )
+
     @classmethod
     def getFrameHeaders(cls, fn):
         """Reads the frame headers of an entire frms6 file. The frame header
@@ -116,75 +186,155 @@ class Frms6Reader(object):
             fn (str): fully qualified file name
 
         Returns:
-            dict: Contents of the all frame headers subdivided into lists, with
-                one list per frame header key
+            dict: Contents of the all frame headers subdivided into
+                numpy.ndarrays, with one array per frame header key. Use
+                ``.tolist()`` where Python lists are needed.
         """
 
-        frameHeight, frameWidth, numberOfFrames = Frms6Reader.getDataShape(fn)
+        frameWidth, frameHeight, numberOfFrames = cls.getDataShape(fn)
+
+        # Every frame in the file is a frame header followed by the frame
+        # contents, so the whole file (minus the file header) is an array
+        # of records. Only the header part of each record is interpreted.
+        recordDtype = cls.getRecordDtype(frameWidth, frameHeight)
+
+        # Memory-map the records right after the file header; only the pages
+        # holding frame headers are copied out when the columns are built
+        records = np.memmap(
+            fn,
+            dtype=recordDtype,
+            mode="r",
+            offset=cls.fileHeaderSizeInBytes,
+            shape=(numberOfFrames,),
+        )
+        frameHeaders = records["header"]
+
+        # Each column is copied out of the map into an array of its own.
+        # Note: maxHeight has always been taken from the ninth entry of the
+        # frame header, i.e. the_start
+        return {
+            "start": np.array(frameHeaders["start"]),
+            "info": np.array(frameHeaders["info"]),
+            "id": np.array(frameHeaders["id"]),
+            "height": np.array(frameHeaders["height"]),
+            "tv_sec": np.array(frameHeaders["tv_sec"]),
+            "tv_usec": np.array(frameHeaders["tv_usec"]),
+            "index": np.array(frameHeaders["index"]),
+            "temp": np.array(frameHeaders["temp"]),
+            "maxHeight": np.array(frameHeaders["the_start"]),
+        }
+
+    @classmethod
+    def _mapFrames(cls, fn, startIdx, endIdx, pixelsX, pixelsY):
+        """Memory-maps the frames [startIdx, endIdx[ of a frm6 file
+
+        Args:
+            fn (str): fully qualified file name
+            startIdx (int): first frame to map
+            endIdx (int): frame after the last frame to map
+            pixelsX (int): number of pixels along x-axis
+            pixelsY (int): number of pixels along y-axis
+
+        Returns:
+            numpy.memmap: Read-only view of the frames (dtype: uint16) with
+                shape (frames, pixels_y, pixels_x), skipping the frame headers
+
+        """
+        numberOfFrames = endIdx - startIdx
 
         # We already know the format of the file header and the frame
         # header (see above), but we have yet to declare the format of the
         # frames. h -> short
-        frameSizeInBytes = cls.getFrameSizeInBytes(frameWidth, frameHeight)
-
-        # Remember contents of the frame header:
-        # frame_dict = OrderedDict([
-        #     ("start", frame_header_item[0]),
-        #     ("info", frame_header_item[1]),
-        #     ("id", frame_header_item[2]),
-        #     ("height", frame_header_item[3]),
-        #     ("tv_sec", frame_header_item[4]),
-        #     ("tv_usec", frame_header_item[5]),
-        #     ("index", frame_header_item[6]),
-        #     ("temp", frame_header_item[7]),
-        #     ("maxHeight", frame_header_item[8])
-        # ])
-        # Each items gets its own list:
-        frameStart = []
-        frameInfo = []
-        frameId = []
-        frameHeight = []
-        frameTvSec = []
-        frameTvUsec = []
-        frameIndex = []
-        frameTemp = []
-        frameMaxHeight = []
+        frameSizeInBytes = cls.getFrameSizeInBytes(pixelsX, pixelsY)
+
+        # When reading the file, we'll jump directly to the frame startIdx
+        offset = cls.fileHeaderSizeInBytes
+        offset += startIdx * (cls.frameHeaderSizeInBytes + frameSizeInBytes)
+        length = numberOfFrames * (cls.frameHeaderSizeInBytes + frameSizeInBytes)
 
+        #
+        # Memory-map the requested frames, each chunk re-maps the file
+        #
+        # Entering the context manager opens the file
         with open(fn, "rb") as fh:
-            # When reading the file, we'll jump directly to the frame startIdx
-            fh.seek(cls.fileHeaderSizeInBytes)
-            for frameIdx in range(numberOfFrames):
-                frameHeaderRaw = fh.read(Frms6Reader.frameHeaderSizeInBytes)
-                frameHeaderItems = cls.frameHeaderStruct.unpack(frameHeaderRaw)
-
-                # Stash contents of the individual frame header in the
-                # respective list
-                frameStart.append(frameHeaderItems[0])
-                frameInfo.append(frameHeaderItems[1])
-                frameId.append(frameHeaderItems[2])
-                frameHeight.append(frameHeaderItems[3])
-                frameTvSec.append(frameHeaderItems[4])
-                frameTvUsec.append(frameHeaderItems[5])
-                frameIndex.append(frameHeaderItems[6])
-                frameTemp.append(frameHeaderItems[7])
-                frameMaxHeight.append(frameHeaderItems[8])
-
-                # Jump to byte after the frame contents
-                fh.seek(
-                    frameSizeInBytes, 1  # force seek relative to the current position
+            # The range is read front to back, so ask the kernel to start
+            # reading its beginning into the page cache right away. The
+            # window is bounded, as the range may be many GB. A length of 0
+            # would advise up to the end of the file.
+            if length and hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(
+                    fh.fileno(),
+                    offset,
+                    min(length, cls.prefetchSizeInBytes),
+                    os.POSIX_FADV_WILLNEED,
                 )
+            # The map starts at the byte after the file header (and any
+            # frames that might already have been read), the page cache
+            # serves the frames without intermediate buffers
+            records = np.memmap(
+                fh,
+                dtype=cls.getRecordDtype(pixelsX, pixelsY),
+                mode="r",
+                offset=offset,
+                shape=(numberOfFrames,),
+            )
 
-        return {
-            "start": frameStart,
-            "info": frameInfo,
-            "id": frameId,
-            "height": frameHeight,
-            "tv_sec": frameTvSec,
-            "tv_usec": frameTvUsec,
-            "index": frameIndex,
-            "temp": frameTemp,
-            "maxHeight": frameMaxHeight,
-        }
+        return records["frame"]
+
+    @classmethod
+    def _readFrames(cls, fn, startIdx, out):
+        """Reads consecutive frames of a frm6 file into a given array
+
+        Args:
+            fn (str): fully qualified file name
+            startIdx (int): first frame to read
+            out (numpy.ndarray): C-contiguous array (dtype: uint16) with
+                shape (frames, pixels_y, pixels_x) receiving the frames
+
+        """
+        numberOfFrames, pixelsY, pixelsX = out.shape
+
+        # Without scattered reads, copy out of the memory-mapped file
+        if not hasattr(os, "preadv"):
+            frames = cls._mapFrames(
+                fn, startIdx, startIdx + numberOfFrames, pixelsX, pixelsY
+            )
+            np.copyto(out, frames)
+            return
+
+        recordSizeInBytes = cls.frameHeaderSizeInBytes
+        recordSizeInBytes += cls.getFrameSizeInBytes(pixelsX, pixelsY)
+        offset = cls.fileHeaderSizeInBytes + startIdx * recordSizeInBytes
+        # All frame headers are dropped into the same throwaway buffer
+        headerBuffer = memoryview(bytearray(cls.frameHeaderSizeInBytes))
+
+        with open(fn, "rb", buffering=0) as fh:
+            # A length of 0 would advise up to the end of the file
+            if numberOfFrames and hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(
+                    fh.fileno(),
+                    offset,
+                    numberOfFrames * recordSizeInBytes,
+                    os.POSIX_FADV_SEQUENTIAL,
+                )
+            # One syscall per batch of frames: the kernel scatters the frame
+            # headers into headerBuffer and the frame contents into out
+            for batchIdx in range(0, numberOfFrames, cls.framesPerRead):
+                buffers = []
+                for frame in out[batchIdx : batchIdx + cls.framesPerRead]:
+                    buffers += [headerBuffer, memoryview(frame).cast("B")]
+                while buffers:
+                    bytesRead = os.preadv(fh.fileno(), buffers, offset)
+                    if bytesRead == 0:
+                        raise ValueError("read_frames -- File ends within the frames!")
+                    offset += bytesRead
+                    # A single read may stop short (e.g. Linux caps it at
+                    # about 2GB), continue after the last byte read
+                    while buffers and bytesRead >= len(buffers[0]):
+                        bytesRead -= len(buffers[0])
+                        buffers.pop(0)
+                    if bytesRead:
+                        buffers[0] = buffers[0][bytesRead:]
 
     @classmethod
     def readData(cls, fn, *args, image_range, **kwargs):
@@ -200,7 +350,10 @@ class Frms6Reader(object):
                 * pixels_y (int): number of pixels along y-axis
 
         Returns:
-            numpy.ndarray: Data read from the frm6 file (dtype: uint16)
+            numpy.ndarray: Data read from the frm6 file (dtype: uint16) with
+                shape (pixels_x, pixels_y, frames). This is a Fortran-ordered
+                view of a C-contiguous (frames, pixels_y, pixels_x) array,
+                which is available without copying as its ``.T``
 
         """
 
@@ -212,60 +365,130 @@ class Frms6Reader(object):
         pixelsX = kwargs.get("pixels_x", None)
         pixelsY = kwargs.get("pixels_y", None)
 
-        # We already know the format of the file header and the frame
-        # header (see above), but we have yet to declare the format of the
-        # frames. h -> short
-        frameSizeInBytes = cls.getFrameSizeInBytes(pixelsX, pixelsY)
+        # chunk will record the frames retrieved from file, in the same
+        # (frame, y, x) layout as on disk so that the copy is sequential
+        chunk = np.empty((numberOfFrames, pixelsY, pixelsX), np.uint16)
+        cls._readFrames(fn, startIdx, chunk)
+
+        # Each frame has shape (pixelsY, pixelsX), as numpy defaults to
+        # C-order (aka row-major aka last index changes fastest), while the
+        # convention in pyDetLib is (pixelsX, pixelsY). I.e. if you want to
+        # select the first row in a pyDetLib data set one does: data[:, 0]
+        # and NOT how numpy encourages by using C-order: data[0, :].
+        # The transpose is a view, (frame, y, x) -> (x, y, frame), no copy.
+        # TODO: Check indexing in pyDetLib
+        return chunk.T
 
-        # When reading the file, we'll jump directly to the frame startIdx
-        offset = cls.fileHeaderSizeInBytes
-        offset += startIdx * (cls.frameHeaderSizeInBytes + frameSizeInBytes)
+    @classmethod
+    def iterFrames(cls, fn, *args, image_range, **kwargs):
+        """Iterates over the frames of a frm6 file without copying them, for
+        consumers that fold the frames one at a time (sums, histograms, ..)
 
-        # chunk will record the frames retrieved from file
-        # TODO: Check indexing in pyDetLib
-        # chunk = np.zeros(
-        #     (pixelsY, pixelsX, numberOfFrames),
-        #     np.uint16
-        # )
-        chunk = np.zeros((pixelsX, pixelsY, numberOfFrames), np.uint16)
+        Args:
+            fn (str): fully qualified file name
+            image_range: 2-tuple [start_idx, end_idx[ defining the
+                range of frames that ought to be read
+            kwargs: the following additional parameters **must** be given:
+
+                * pixels_x (int): number of pixels along x-axis
+                * pixels_y (int): number of pixels along y-axis
+
+        Yields:
+            memoryview: One frame (format: uint16) with shape
+                (pixels_y, pixels_x), backed by the memory-mapped file.
+                ``np.asarray(frame).T`` gives the (pixels_x, pixels_y)
+                orientation of readData without a copy
+
+        """
+        startIdx, endIdx = image_range
+        pixelsX = kwargs.get("pixels_x", None)
+        pixelsY = kwargs.get("pixels_y", None)
+
+        frames = cls._mapFrames(fn, startIdx, endIdx, pixelsX, pixelsY)
+
+        # _mapFrames prefetches the first window of frames, the following
+        # windows are requested one window ahead of the consumer
+        recordSizeInBytes = cls.frameHeaderSizeInBytes
+        recordSizeInBytes += cls.getFrameSizeInBytes(pixelsX, pixelsY)
+        framesPerPrefetch = max(1, cls.prefetchSizeInBytes // recordSizeInBytes)
+        offset = cls.fileHeaderSizeInBytes + startIdx * recordSizeInBytes
 
-        #
-        # Seek & read, each chunks re-opens file
-        #
-        # Entering the context manager opens the file
         with open(fn, "rb") as fh:
-            # Jump to the byte after the file header (and
-            # any frames that might already have been read)
-            fh.seek(offset)
-            for frameIdx in range(numberOfFrames):
-                # Jump to byte after the frame header
-                fh.seek(
-                    cls.frameHeaderSizeInBytes,
-                    1,  # force seek relative to the current position
+            for frameIdx, frame in enumerate(frames):
+                # The next window, clipped to the requested range
+                prefetchStartIdx = frameIdx + framesPerPrefetch
+                prefetchEndIdx = min(prefetchStartIdx + framesPerPrefetch, len(frames))
+                if (
+                    frameIdx % framesPerPrefetch == 0
+                    and prefetchStartIdx < prefetchEndIdx
+                    and hasattr(os, "posix_fadvise")
+                ):
+                    os.posix_fadvise(
+                        fh.fileno(),
+                        offset + prefetchStartIdx * recordSizeInBytes,
+                        (prefetchEndIdx - prefetchStartIdx) * recordSizeInBytes,
+                        os.POSIX_FADV_WILLNEED,
+                    )
+                yield memoryview(frame)
+
+    @classmethod
+    def readRanges(cls, fn, *args, image_ranges, workers=4, **kwargs):
+        """Reads several chunks of data from a frm6 file in parallel. Each
+        chunk is read by readData in a thread of its own; the file reads
+        release the GIL.
+
+        Args:
+            fn (str): fully qualified file name
+            image_ranges: list of 2-tuples [start_idx, end_idx[, one per
+                chunk that ought to be read
+            workers (int = 4, optional): number of threads reading chunks
+            kwargs: the following additional parameters **must** be given:
+
+                * pixels_x (int): number of pixels along x-axis
+                * pixels_y (int): number of pixels along y-axis
+
+        Returns:
+            list: One numpy.ndarray per entry in image_ranges, as returned
+                by readData
+
+        """
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chunks = list(
+                executor.map(
+                    lambda image_range: cls.readData(
+                        fn, image_range=image_range, **kwargs
+                    ),
+                    image_ranges,
                 )
-                # Read from file handle. Note: contents of the frame
-                # are given as unsigned 16 bit integers
-                currentFrame = np.frombuffer(fh.read(frameSizeInBytes), np.uint16)
-                # Since the currentFrame data is flat, we must re-shape.
-                # Numpy defaults to C-order (aka row-major aka index WITHIN
-                # a row aka last index changes fastest). In the reshape,
-                # the newshape must have the slow index aka column-index aka
-                # y-index first. However..
-                currentFrame = currentFrame.reshape((pixelsY, pixelsX))
-                # ..this means that currentFrame.shape = (pixelsY, pixelsX),
-                # while the convention in pyDetLib is (pixelsX, pixelsY). I.e.
-                # if you want to select the first row in a pyDetLib data set
-                # one does: data[:, 0] and NOT how numpy encourages by using
-                # C-order: data[0, :].
-                chunk[:, :, frameIdx] = np.transpose(currentFrame)
-                # FYI: The same is achieved by using
-                # currentFrame = np.reshape(
-                #     currentFrame,        # Flat currentFrame data
-                #     (pixelsX, pixelsY),  # Expected shape (width, height)
-                #     order='F'            # Use fortran order (column-first)
-                # )
-
-        return chunk
+            )
+        return chunks
+
+    @classmethod
+    def toNpy(cls, fn, outFn):
+        """Writes all frames of a frm6 file, without the frame headers, to a
+        .npy file. Later runs can then open the frames in O(1) with
+        ``np.load(outFn, mmap_mode="r")`` instead of parsing the frm6 file.
+
+        Args:
+            fn (str): fully qualified file name of the frm6 file
+            outFn (str): fully qualified file name of the .npy file
+
+        Returns:
+            tuple: Shape of the stored array, (frames, height, width)
+
+        """
+        frameWidth, frameHeight, numberOfFrames = cls.getDataShape(fn)
+        shape = (numberOfFrames, frameHeight, frameWidth)
+
+        # open_memmap writes the .npy header (picking the format version)
+        # and maps the data section right behind it, so the frames are read
+        # straight into the output file
+        data = np.lib.format.open_memmap(outFn, mode="w+", dtype=np.uint16, shape=shape)
+        cls._readFrames(fn, 0, data)
+        data.flush()
+        del data
+
+        return shape
 
     @classmethod
     def getFileHeader(cls, fn):
@@ -322,19 +545,87 @@ class Frms6Reader(object):
         frameAndHeaderSizeInBytes += cls.getFrameSizeInBytes(frameWidth, frameHeight)
         # Finally get the whole file size (in bytes, again)
         fileSize = os.path.getsize(fn)
-        # Do the math ..
-        numberOfFrames = (
-            fileSize - cls.fileHeaderSizeInBytes
-        ) / frameAndHeaderSizeInBytes
+        # Do the math in integers ..
+        numberOfFrames, remainder = divmod(
+            fileSize - cls.fileHeaderSizeInBytes, frameAndHeaderSizeInBytes
+        )
         # .. and verify that the number of frames is integer!
-        if not float(numberOfFrames).is_integer():
-            raise Warning("read_frames -- Number of frames is not integer!")
-        else:
-            numberOfFrames = int(numberOfFrames)
+        if remainder:
+            raise ValueError("read_frames -- Number of frames is not integer!")
 
         return (frameWidth, frameHeight, numberOfFrames)
 
 
+# Open HDF5 files shared by readData and getDataSize, keyed by real path and
+# kept in least recently used order. Each handle holds a 256MB chunk cache,
+# so only the most recent few stay open.
+_openFiles = OrderedDict()
+_maxOpenFiles = 4
+# Guards _openFiles, and is held while a handle from it is used, so that no
+# handle is closed (evicted or replaced) by one thread while another thread
+# reads from it. HDF5 calls are serialised by h5py anyway.
+_openFilesLock = threading.RLock()
+
+
+def _openFile(filename):
+    """Returns a read-only handle to a given file (family), opening it on
+    first use only. Opening a family means touching all of its members, so
+    the handle is kept open for the following calls instead. The file is
+    reopened if it has been replaced or modified on disk since.
+
+    Args:
+        filename (str): the file path and name. If the file is actually a
+            family of files only the first file, i.e. the one with index
+            00000.h5 should be given.
+
+    Returns:
+        h5py.File: the open file
+
+    """
+    with _openFilesLock:
+        realFilename = os.path.realpath(filename)
+        fileStat = os.stat(realFilename)
+        fileStamp = (fileStat.st_mtime_ns, fileStat.st_ino)
+
+        stamp, f = _openFiles.pop(realFilename, (None, None))
+        # A handle that has been closed in the meantime evaluates to False
+        if f and stamp != fileStamp:
+            f.close()
+        if not f or stamp != fileStamp:
+            if filename.find("00000") != -1:
+                filenameFam = filename.replace("00000", "%05d")
+
+                f = h5py.File(
+                    filenameFam,
+                    "r",
+                    driver="family",
+                    memb_size=20 * 1024 ** 3,  # 20GB chunks
+                    rdcc_nbytes=256 * 1024 ** 2,  # 256MB chunk cache
+                )
+            else:
+                f = h5py.File(filename, "r", rdcc_nbytes=256 * 1024 ** 2)
+        _openFiles[realFilename] = (fileStamp, f)
+
+        # Close the least recently used handles beyond the limit
+        while len(_openFiles) > _maxOpenFiles:
+            _, (_, evicted) = _openFiles.popitem(last=False)
+            if evicted:
+                evicted.close()
+        return f
+
+
+def closeFiles():
+    """Closes all HDF5 files kept open by readData and getDataSize, e.g. to
+    release them before they are opened for writing in the same process.
+
+    """
+    with _openFilesLock:
+        while _openFiles:
+            _, (_, f) = _openFiles.popitem()
+            if f:
+                f.close()
+
+
 def readData(filename, path="/stream", **kwargs):
     """Reads data from a given file (family) and output reordered images
     in stacks
@@ -352,6 +643,11 @@ def readData(filename, path="/stream", **kwargs):
             * y_range ([low, high]): a range of pixels to be read
             * pixels_x (int): number of pixels along x-axis, **compatibility only**.
             * pixels_y (int): number of pixels along y-axis, **compatibility only**.
+            * dtype (numpy.dtype, optional): dtype of the returned data.
+              Defaults to numpy.float32 for integer data of up to 16 bit,
+              which float32 represents exactly, and to the smallest float
+              type holding the data exactly otherwise (e.g. numpy.float64
+              for float64 or 32 bit integer data).
 
 
     Returns:
@@ -360,6 +656,9 @@ def readData(filename, path="/stream", **kwargs):
     Note:
         This function is compatible with  xfelpycaltools.ChunkedReader
 
+        The file is kept open (read-only) for later calls until closeFiles
+        is called, e.g. before opening it for writing in the same process.
+
 
     """
 
@@ -369,43 +668,54 @@ def readData(filename, path="/stream", **kwargs):
     pixelsX = kwargs.get("pixels_x", None)
     pixelsY = kwargs.get("pixels_y", None)
     simulated = kwargs.get("simulated", False)
+    outDtype = kwargs.get("dtype", None)
+
+    imageSlice = slice(None)
+    if imageRange != None:
+        imageSlice = slice(imageRange[0], imageRange[1])
+    pixelSlices = (slice(None), slice(None))
+    if pixelXRange != None or pixelYRange != None:
+        pixelSlices = (
+            slice(pixelXRange[0], pixelXRange[1]),
+            slice(pixelYRange[0], pixelYRange[1]),
+        )
 
-    f = None
-    if filename.find("00000") != -1:
-        filenameFam = filename.replace("00000", "%05d")
-
-        f = h5py.File(
-            filenameFam, "r", driver="family", memb_size=20 * 1024 ** 3
-        )  # 20GB chunks
-    else:
-        f = h5py.File(filename, "r")
-
-    din = None
-    if imageRange == None:
-        din = f[path]
+    # Only the image range is on the first axis of simulated data, the pixel
+    # ranges are applied once the axes have been reordered
+    if not simulated:
+        sourceSel = pixelSlices + (imageSlice,)
     else:
-        if not simulated:
-            din = f[path][:, :, imageRange[0] : imageRange[1]]
-        else:
-            din = f[path][imageRange[0] : imageRange[1], :, :]
+        sourceSel = (imageSlice,)
+
+    # The handle is only used while holding the lock, see _openFilesLock
+    with _openFilesLock:
+        dset = _openFile(filename)[path]
+
+        # Detector counts of up to 16 bit fit into float32 without loss, any
+        # other data keeps (at least) its own precision
+        if outDtype is None:
+            if dset.dtype.kind in "iu" and dset.dtype.itemsize <= 2:
+                outDtype = np.float32
+            else:
+                outDtype = np.result_type(dset.dtype, np.float32)
+
+        # Read straight into a preallocated array, HDF5 casts on the fly chunk
+        # by chunk, so no full-size copy in the dataset dtype is ever made
+        shape = tuple(
+            len(range(*sel.indices(size))) for sel, size in zip(sourceSel, dset.shape)
+        )
+        shape += dset.shape[len(sourceSel) :]
+        d = np.empty(shape, outDtype)
+        dset.read_direct(d, source_sel=sourceSel)
 
     if simulated:
-        din = np.squeeze(din)
-        din = np.rollaxis(din, 2)
-        din = np.rollaxis(din, 2)
-        din = np.rollaxis(din, 1)
+        d = np.squeeze(d)
+        # Swap the first and third axes, (image, y, x) -> (x, y, image)
+        d = np.transpose(d, (2, 1, 0) + tuple(range(3, d.ndim)))
 
-        din = np.ascontiguousarray(din)
+        d = np.ascontiguousarray(d[pixelSlices])
 
-    d = None
-    if pixelXRange == None and pixelYRange == None:
-        d = np.array(din[:, :, :])
-    else:
-        d = np.array(
-            din[pixelXRange[0] : pixelXRange[1], pixelYRange[0] : pixelYRange[1], :]
-        )
-    f.close()
-    return np.asarray(d, np.float64)
+    return d
 
 
 def getDataSize(filename, path="/stream"):
@@ -418,19 +728,14 @@ def getDataSize(filename, path="/stream"):
         path (str = '/stream', optional): the path in the hdf5 file at which
             the data is located.
 
-    """
+    Note:
+        The file is kept open (read-only) for later calls until closeFiles
+        is called, e.g. before opening it for writing in the same process.
 
-    f = None
-    if filename.find("00000") != -1:
-        filenameFam = filename.replace("00000", "%05d")
-        # print filenameFam
-        f = h5py.File(
-            filenameFam, "r", driver="family", memb_size=20 * 1024 ** 3
-        )  # 20GB chunks
-    else:
-        f = h5py.File(filename, "r")
+    """
 
-    return f[path].shape
+    with _openFilesLock:
+        return _openFile(filename)[path].shape
 
 
 def get_data_ref(data_dir):